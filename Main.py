@@ -1,46 +1,215 @@
 import requests
+from requests.adapters import HTTPAdapter  # 用于配置连接池和自动重试
+from urllib3.util.retry import Retry
 import re
 import html2text  # 用于将HTML转换为Markdown
 import time
+import email.utils  # 用于解析HTTP日期格式的Retry-After头
 import json
-import hashlib  # 用于为图片URL生成哈希，作为文件名的一部分
+import hashlib  # 用于计算图片内容的哈希，作为图片文件名
 import os
+import tempfile  # 用于下载图片时创建临时文件
 import urllib.parse  # 用于URL解析
 import urllib.request  # 用于路径和URL之间的转换
-from datetime import datetime  # 用于处理和比较时间
+from datetime import datetime  # 用于解析Frontmatter中的时间字符串
+import threading  # 用于保护多线程共享的图片下载状态
+from concurrent.futures import ThreadPoolExecutor  # 用于并发下载项目和图片
 import yaml  # 用于解析和生成Markdown文件头部的Frontmatter
 
+try:
+    # LibYAML的C实现解析速度快数倍；未编译LibYAML时回退到纯Python实现
+    from yaml import CSafeLoader as YamlSafeLoader
+except ImportError:
+    from yaml import SafeLoader as YamlSafeLoader
+
+try:
+    import orjson  # 可选依赖：C实现的JSON库，解析速度明显快于标准库json
+except ImportError:
+    orjson = None
+
 # --- 全局变量 ---
-# GLOBAL_IMAGE_URL_TO_PATH_MAP 在单次脚本运行期间缓存已下载图片的URL及其本地路径，
-# 避免在同一次运行中对相同的图片URL重复下载。脚本重启后会清空。
+# GLOBAL_IMAGE_URL_TO_PATH_MAP 缓存已下载图片的URL及其本地路径，避免对相同的图片URL重复下载。
+# 运行开始时从全局图片库中的索引文件加载，下载新图片后写回，因此在多次运行之间保留。
 GLOBAL_IMAGE_URL_TO_PATH_MAP = {}
+# GLOBAL_IMAGE_HASH_TO_PATH_MAP 记录全局图片库中每个图片内容哈希对应的文件路径，
+# 使不同URL下载到的相同图片即使推断出的扩展名不同，也只保存一份。运行开始时由扫描图片库建立。
+GLOBAL_IMAGE_HASH_TO_PATH_MAP = {}
+# IMAGE_DOWNLOAD_FUTURES 记录正在下载中的图片URL及其Future，使并发请求同一图片的线程共享一次下载。
+# 以上三个字典都由 IMAGE_DOWNLOAD_LOCK 保护。
+IMAGE_DOWNLOAD_FUTURES = {}
+IMAGE_DOWNLOAD_LOCK = threading.Lock()
 CONFIG_FILE_URL = "url.json"  # 存储收藏夹URL和保存路径的配置文件名
 CONFIG_FILE_COOKIES = "Cookies.json"  # 存储登录知乎所需的Cookies文件名
+IMAGE_URL_INDEX_FILE = "_url_index.json"  # 全局图片库中记录图片URL与本地文件名对应关系的索引文件名
+DEFAULT_DOWNLOAD_THREADS = 64  # url.json 未指定 'threads' 时，并发下载项目和图片的默认线程数
+NETWORK_RETRY_INITIAL_DELAY = 5  # 获取页面遇到网络错误时，首次重试前等待的秒数，之后每次翻倍
+NETWORK_RETRY_MAX_DELAY = 60  # 重试等待时间的上限 (秒)
+NETWORK_RETRY_MAX_ATTEMPTS = 10  # 同一页面连续重试的最大次数，超过后放弃该收藏夹
+HTTP_POOL_CONNECTIONS = 20  # 每个会话缓存的主机连接池数量
+HTTP_POOL_MAXSIZE = 50  # 每个主机连接池中保持的最大连接数
+IMAGE_DOWNLOAD_CHUNK_SIZE = 65536  # 流式下载图片时每次读取的字节数
+# 文件名中需删除的字符：Windows系统非法字符及ASCII控制字符，预先构建str.translate所用的转换表
+FILENAME_ILLEGAL_CHARS_TABLE = str.maketrans('', '', '\\/:*?"<>|' + ''.join(chr(c) for c in range(32)))
+FRONTMATTER_TIME_FORMAT = '%Y-%m-%d %H:%M'  # Frontmatter中时间字段的格式，也是判断修改时间是否相同的精度
+PLACEHOLDER_URLS = (None, '', '#')  # API未提供链接时使用的占位URL，不能用于判断重复
+UNIX_TIMESTAMP_MAX = 253402300799  # 有效Unix时间戳 (秒) 的上限，即 9999-12-31 23:59:59 UTC，毫秒时间戳会超出此范围
+# 图片文件头特征: (偏移量, 特征字节) 组成的条件全部满足时使用对应扩展名
+IMAGE_MAGIC_SIGNATURES = (
+    (((0, b'\x89PNG'),), '.png'),
+    (((0, b'\xff\xd8'),), '.jpg'),
+    (((0, b'GIF8'),), '.gif'),
+    (((0, b'RIFF'), (8, b'WEBP')), '.webp'),
+    (((0, b'<svg'),), '.svg'),
+    (((0, b'<?xml'),), '.svg'),
+)
+IMAGE_URL_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg')  # 无法识别文件头时，从URL路径中接受的扩展名
+MARKDOWN_IMAGE_PATTERN = re.compile(r'!\[(?P<alt>.*?)\]\((?P<link>[^)\n]+)\)')  # 匹配Markdown图片语法 ![alt](link)，不跨行
 
 
 # --- 工具函数 ---
 def sanitize_filename(filename):
     """
-    移除文件名中的Windows系统非法字符，并去除首尾空格，以确保文件名在各操作系统上的兼容性。
+    移除文件名中的Windows系统非法字符 (包括换行等控制字符)，并去除首尾空格，以确保文件名在各操作系统上的兼容性。
     Args:
         filename (str): 原始文件名。
     Returns:
         str: 清理后的文件名。
     """
-    illegal_characters = ['\\', '/', ':', '*', '?', '"', '<', '>', '|']
-    for char in illegal_characters:
-        filename = filename.replace(char, '')
-    return filename.strip()
+    return filename.translate(FILENAME_ILLEGAL_CHARS_TABLE).strip()
+
+
+def format_timestamp(unix_time):
+    """
+    将Unix时间戳格式化为Frontmatter使用的本地时间字符串 (FRONTMATTER_TIME_FORMAT)。
+    Args:
+        unix_time (int): Unix时间戳 (秒)。
+    Returns:
+        str: 格式化后的时间字符串。
+    """
+    return time.strftime(FRONTMATTER_TIME_FORMAT, time.localtime(unix_time))
+
+
+def validate_unix_timestamp(unix_time):
+    """
+    检查API返回的时间字段是否为合理范围内的Unix时间戳 (秒)。
+    Args:
+        unix_time: API返回的时间字段值。
+    Returns:
+        int or float: 原样返回通过检查的时间戳。
+    Raises:
+        TypeError: 时间字段不是数值。
+        ValueError: 时间戳超出有效范围 (如毫秒时间戳)。
+    """
+    if isinstance(unix_time, bool) or not isinstance(unix_time, (int, float)):
+        raise TypeError(f"时间戳类型无效: {unix_time!r}")
+    if not 0 <= unix_time <= UNIX_TIMESTAMP_MAX:
+        raise ValueError(f"时间戳超出有效范围: {unix_time!r}")
+    return unix_time
+
+
+def html_to_markdown(html_str):
+    """
+    使用html2text将HTML转换为Markdown：不自动换行，保留链接和图片。
+    每次调用都新建转换器——HTML2Text在handle()后不会重置解析状态，
+    复用同一实例时，上一篇内容中未闭合的<style>、<table>等标签会导致后续内容被吞掉。
+    Args:
+        html_str (str): HTML字符串。
+    Returns:
+        str: 转换后的Markdown字符串。
+    """
+    converter = html2text.HTML2Text()
+    converter.body_width = 0
+    converter.ignore_links = False
+    converter.ignore_images = False
+    return converter.handle(html_str)
+
+
+def parse_json(data):
+    """
+    解析JSON字节串或字符串。安装了orjson时使用orjson解析，否则回退到标准库json。
+    Args:
+        data (bytes or str): JSON数据。
+    Returns:
+        解析得到的Python对象。
+    Raises:
+        json.JSONDecodeError: 数据不是有效的JSON (orjson.JSONDecodeError 是其子类)。
+    """
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def load_json_file(filepath):
+    """
+    读取并解析JSON文件。
+    Args:
+        filepath (str): JSON文件路径。
+    Returns:
+        解析得到的Python对象。
+    Raises:
+        FileNotFoundError: 文件不存在。
+        json.JSONDecodeError: 文件内容不是有效的JSON。
+    """
+    with open(filepath, "rb") as f:
+        return parse_json(f.read())
+
+
+def dump_json_file(obj, filepath):
+    """
+    将对象以缩进2格、保留非ASCII字符的UTF-8 JSON格式写入文件。安装了orjson时使用orjson序列化。
+    Args:
+        obj: 要写入的对象。
+        filepath (str): 目标文件路径。
+    """
+    if orjson is not None:
+        data = orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    else:
+        data = json.dumps(obj, ensure_ascii=False, indent=2).encode("utf-8")
+    with open(filepath, "wb") as f:
+        f.write(data)
+
+
+def mount_http_adapter(session, pool_maxsize=HTTP_POOL_MAXSIZE):
+    """
+    为会话挂载带连接池和自动重试的HTTPAdapter。
+    复用连接可避免每次请求都重新进行TCP和TLS握手；遇到429及5xx响应时按指数退避自动重试。
+    Args:
+        session (requests.Session): 要配置的会话。
+        pool_maxsize (int): 每个主机连接池中保持的最大连接数，应不小于并发请求数。
+    """
+    # raise_on_status=False：重试用尽后返回最后的响应，由 raise_for_status() 抛出带响应 (含Retry-After头) 的HTTPError
+    retry = Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=pool_maxsize, max_retries=retry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+
+
+def create_http_session():
+    """
+    创建一个已挂载连接池和自动重试的requests会话。
+    Returns:
+        requests.Session: 新建的会话。
+    """
+    session = requests.Session()
+    mount_http_adapter(session)
+    return session
+
+
+# ZHIHU_SESSION 用于访问知乎API，Cookies和请求头在 main() 中设置一次；
+# IMAGE_SESSION 用于从图片CDN下载图片，单独使用以免将登录Cookies发送给其他主机。
+ZHIHU_SESSION = create_http_session()
+IMAGE_SESSION = create_http_session()
+IMAGE_SESSION.headers['accept-encoding'] = 'identity'  # 图片本身已压缩，无需再进行传输压缩
+# 所有项目共享的图片下载线程池，限制同时进行的图片下载数量。main() 会按配置的线程数重新创建。
+IMAGE_DOWNLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=DEFAULT_DOWNLOAD_THREADS)
 
 
 # --- 知乎API交互 ---
-def get_answer_count(collection_url, cookies, headers, params_template):
+def get_answer_count(collection_url, params_template):
     """
     通过知乎API获取指定收藏夹中的项目总数。
     Args:
         collection_url (str): 收藏夹的URL。
-        cookies (dict): 用于请求的Cookies。
-        headers (dict): 用于请求的HTTP头。
         params_template (dict): API请求参数的模板。
     Returns:
         int: 收藏夹中的项目总数，获取失败则返回0。
@@ -52,9 +221,9 @@ def get_answer_count(collection_url, cookies, headers, params_template):
     api_collection_id = collection_url.split('/')[-1]  # 从URL中提取收藏夹ID
     api_url = f"https://www.zhihu.com/api/v4/collections/{api_collection_id}/items"
     try:
-        resp = requests.get(api_url, params=params, cookies=cookies, headers=headers, timeout=10)
+        resp = ZHIHU_SESSION.get(api_url, params=params, timeout=10)
         resp.raise_for_status()
-        data = resp.json()
+        data = parse_json(resp.content)
         resp.close()
         return data.get('paging', {}).get('totals', 0)  # 从响应中获取总数
     except Exception as e:
@@ -62,39 +231,75 @@ def get_answer_count(collection_url, cookies, headers, params_template):
         return 0
 
 
-def get_page_json(collection_api_url_base, cookies, headers, params):
+def get_page_json(collection_api_url_base, params):
     """
     从知乎收藏夹API分页获取项目列表的JSON数据。
     Args:
         collection_api_url_base (str): 收藏夹项目API的基础URL。
-        cookies (dict): 请求Cookies。
-        headers (dict): 请求HTTP头。
         params (dict): 包含offset和limit的分页参数。
     Returns:
-        list: 包含当前页面项目JSON对象的列表，失败则返回空列表。
+        list: 包含当前页面项目JSON对象的列表，响应无法解析时返回空列表。
+    Raises:
+        requests.exceptions.RequestException: 网络错误或HTTP错误状态，由调用方决定是否重试。
     """
-    try:
-        response = requests.get(collection_api_url_base, params=params, cookies=cookies, headers=headers, timeout=10)
+    with ZHIHU_SESSION.get(collection_api_url_base, params=params, timeout=10) as response:
         response.raise_for_status()
-        data = response.json().get('data', [])
-        response.close()
-        return data
-    except Exception as e:
-        print(f"    API请求或JSON解析错误 (get_page_json): {e}")
+        try:
+            return parse_json(response.content).get('data', [])
+        except (ValueError, AttributeError) as e:
+            print(f"    API响应JSON解析错误 (get_page_json): {e}")
     return []
 
 
+def is_retryable_request_error(error):
+    """
+    判断请求异常是否为可重试的临时错误：连接错误、超时、429 (请求过多) 及 5xx 服务器错误。
+    401/403/404 等其他HTTP错误 (如Cookies过期) 重试也不会成功。
+    Args:
+        error (requests.exceptions.RequestException): 请求异常。
+    Returns:
+        bool: 可重试返回True，否则返回False。
+    """
+    if isinstance(error, requests.exceptions.HTTPError):
+        status_code = error.response.status_code if error.response is not None else None
+        return status_code is not None and (status_code == 429 or status_code >= 500)
+    return isinstance(error, (requests.exceptions.ConnectionError, requests.exceptions.Timeout))
+
+
+def get_retry_after_seconds(response):
+    """
+    读取HTTP响应中的Retry-After头 (秒数或HTTP日期格式)，得到服务器要求的等待秒数。
+    Args:
+        response (requests.Response or None): HTTP响应。
+    Returns:
+        int or None: 需要等待的秒数 (不超过 NETWORK_RETRY_MAX_DELAY)，没有有效的Retry-After头时返回None。
+    """
+    retry_after = response.headers.get('retry-after') if response is not None else None
+    if not retry_after:
+        return None
+    if retry_after.strip().isdigit():
+        seconds = int(retry_after)
+    else:
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            seconds = int(retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+    return max(0, min(seconds, NETWORK_RETRY_MAX_DELAY))
+
+
 def get_item_metadata_and_content(item_json):
     """
-    从单个知乎项目的JSON数据中提取元数据，并将HTML内容转换为Markdown。
+    从单个知乎项目的JSON数据中提取元数据和HTML内容。
+    HTML到Markdown的转换推迟到确定需要保存该项目之后 (见 save_collection_item)，跳过的项目无需转换。
     Args:
         item_json (dict): 单个知乎项目的JSON对象。
-    Returns:,
-        tuple: 包含元数据字典 (metadata) 和Markdown内容字符串 (md_text_str) 的元组。
+    Returns:
+        tuple: 包含元数据字典 (metadata) 和HTML内容字符串 (html_content_str) 的元组。
     """
     # 初始化元数据字典和内容字符串
     metadata = {'title': "未命名内容", 'url': "#", 'author': "未知作者", 'author_badge': "",
-                'created': None, 'modified': None, 'upvote_num': 0, 'comment_num': 0, 'location': ""}
+                'created_ts': None, 'modified_ts': None, 'upvote_num': 0, 'comment_num': 0, 'location': ""}
     html_content_str = "错误: 内容未找到。"
 
     content_data = item_json.get('content', {})
@@ -108,10 +313,11 @@ def get_item_metadata_and_content(item_json):
 
         created_unix_time = content_data.get('created_time', content_data.get('created', 0))
         updated_unix_time = content_data.get('updated_time', content_data.get('updated', created_unix_time))
-        if created_unix_time:
-            metadata['created'] = datetime.fromtimestamp(created_unix_time)
-        if updated_unix_time:
-            metadata['modified'] = datetime.fromtimestamp(updated_unix_time)
+        # 保留原始时间戳，写入Frontmatter时再格式化；无效的时间戳在此处即按解析错误处理
+        created_unix_time = validate_unix_timestamp(created_unix_time) if created_unix_time else None
+        updated_unix_time = validate_unix_timestamp(updated_unix_time) if updated_unix_time else None
+        metadata['created_ts'] = created_unix_time
+        metadata['modified_ts'] = updated_unix_time
 
         metadata['upvote_num'] = content_data.get('voteup_count', 0)
         metadata['comment_num'] = content_data.get('comment_count', 0)
@@ -150,18 +356,18 @@ def get_item_metadata_and_content(item_json):
             html_content_str = (f"<p><strong>视频: {content_data.get('title', '')}</strong></p><p><a href='{metadata['url']}'>在知乎观看</a></p>"
                                 f"<p>作者: {metadata['author']}</p><p><img src='{content_data.get('video', {}).get('thumbnail', '')}' alt='视频封面'></p>")
         else:  # 未知类型或旧API结构的回退逻辑
-            try:
-                title_try = content_data['question']['title']
-            except:
-                try:
-                    title_try = content_data['title']
-                except:
-                    try:
-                        title_try = '想法：' + content_data['content'][0]['title']
-                    except:
-                        title_try = f"未知类型_{content_data.get('id', '无ID')}"
-            metadata['title'] = sanitize_filename(title_try)
+            # 依次尝试问题标题、内容标题、首个内容块标题，均不可用时使用项目ID
+            question = content_data.get('question')
+            title_try = question.get('title') if isinstance(question, dict) else None
+            if not title_try:
+                title_try = content_data.get('title')
             raw_html = content_data.get('content', '不支持的内容类型或结构。')
+            if not title_try and isinstance(raw_html, list) and raw_html and isinstance(raw_html[0], dict) \
+                    and raw_html[0].get('title'):
+                title_try = '想法：' + str(raw_html[0]['title'])
+            if not title_try:
+                title_try = f"未知类型_{content_data.get('id', '无ID')}"
+            metadata['title'] = sanitize_filename(str(title_try))
             if isinstance(raw_html, list) and raw_html:
                 html_content_str = raw_html[0].get('content', '不支持的列表内容。')
             elif isinstance(raw_html, str):
@@ -169,23 +375,14 @@ def get_item_metadata_and_content(item_json):
     except Exception as e:
         print(f"    解析元数据或内容时出错: {e} - 项目ID: {content_data.get('id', '未知ID')}")
         metadata['title'] = f"解析内容出错_{content_data.get('id', str(time.time()))}"
-
-    converter = html2text.HTML2Text()
-    converter.body_width = 0
-    converter.ignore_links = False
-    converter.ignore_images = False
-    try:
-        md_text_str = converter.handle(str(html_content_str))
-    except Exception as e:
-        print(f"    html2text转换错误: {e}")
-        md_text_str = "错误: HTML转Markdown失败。"
-    return metadata, md_text_str
+    return metadata, str(html_content_str)
 
 
 def generate_frontmatter(metadata_dict):
     """
     使用 PyYAML 根据元数据字典生成Markdown Frontmatter字符串。
     能正确处理包含换行符或YAML特殊字符的字段。
+    这里不使用LibYAML的CSafeDumper：它会把emoji等BMP之外的字符转义为 \\U 序列，降低Frontmatter的可读性。
     Args:
         metadata_dict (dict): 包含元数据的字典。
     Returns:
@@ -198,8 +395,8 @@ def generate_frontmatter(metadata_dict):
     if metadata_dict.get('location'):
         fm_data['location'] = metadata_dict.get('location')
     # 时间格式化为 "YYYY-MM-DD HH:MM"
-    fm_data['created'] = metadata_dict['created'].strftime('%Y-%m-%d %H:%M') if metadata_dict.get('created') else "N/A"
-    fm_data['modified'] = metadata_dict['modified'].strftime('%Y-%m-%d %H:%M') if metadata_dict.get('modified') else "N/A"
+    fm_data['created'] = format_timestamp(metadata_dict['created_ts']) if metadata_dict.get('created_ts') else "N/A"
+    fm_data['modified'] = format_timestamp(metadata_dict['modified_ts']) if metadata_dict.get('modified_ts') else "N/A"
     fm_data['upvote_num'] = metadata_dict.get('upvote_num', 0)
     fm_data['comment_num'] = metadata_dict.get('comment_num', 0)
 
@@ -220,30 +417,30 @@ def parse_frontmatter_from_file(filepath):
                       否则返回None。
     """
     try:
+        # 逐行读取，读到Frontmatter结束标志即停止，不读取可能很大的正文
         with open(filepath, 'r', encoding='utf-8') as f:
-            content_lines = f.readlines()
-        if not content_lines or not content_lines[0].strip() == "---":
-            return None  # 非标准Frontmatter开头
-        fm_end_index = -1
-        for i, line in enumerate(content_lines[1:], start=1):
-            if line.strip() == "---":
-                fm_end_index = i
-                break
-        if fm_end_index == -1:
-            return None  # 未找到Frontmatter结束标志
+            if next(f, '').strip() != "---":
+                return None  # 非标准Frontmatter开头
+            frontmatter_lines = []
+            for line in f:
+                if line.strip() == "---":
+                    break
+                frontmatter_lines.append(line)
+            else:
+                return None  # 未找到Frontmatter结束标志
 
-        frontmatter_str = "".join(content_lines[1:fm_end_index])
+        frontmatter_str = "".join(frontmatter_lines)
         try:
-            metadata = yaml.safe_load(frontmatter_str)
+            metadata = yaml.load(frontmatter_str, Loader=YamlSafeLoader)
             if not isinstance(metadata, dict):
                 return None
             # 将Frontmatter中的时间字符串转换为datetime对象，便于比较
             for key in ['created', 'modified']:
                 time_str = metadata.get(key)
                 dt_obj = None
-                if time_str and isinstance(time_str, str):
+                if time_str and isinstance(time_str, str) and time_str != "N/A":  # "N/A" 是 generate_frontmatter 写入的无时间占位值
                     try:
-                        dt_obj = datetime.strptime(time_str, '%Y-%m-%d %H:%M')
+                        dt_obj = datetime.strptime(time_str, FRONTMATTER_TIME_FORMAT)
                     except ValueError:
                         try:
                             dt_obj = datetime.strptime(time_str, '%Y-%m-%d %H:%M:%S')
@@ -264,226 +461,404 @@ def parse_frontmatter_from_file(filepath):
 
 
 # --- 图片处理与文件操作 ---
-def process_markdown_images_globally(original_md_content_with_fm, md_file_save_dir_abs, global_image_root_path_abs):
+def load_image_url_index(global_image_root_path_abs):
+    """
+    从全局图片库中的索引文件加载图片URL到本地路径的映射。对应文件已不存在的条目会被忽略。
+    Args:
+        global_image_root_path_abs (str): 全局图片库的绝对根目录。
+    Returns:
+        dict: 图片URL到本地绝对路径的映射，索引文件不存在或无效时返回空字典。
+    """
+    index_path = os.path.join(global_image_root_path_abs, IMAGE_URL_INDEX_FILE)
+    try:
+        url_to_filename = load_json_file(index_path)
+    except FileNotFoundError:
+        return {}
+    except (json.JSONDecodeError, OSError) as e:
+        print(f"警告: 图片索引文件 '{index_path}' 读取失败，将重新建立索引: {e}")
+        return {}
+    if not isinstance(url_to_filename, dict):
+        return {}
+
+    existing_filenames = set(os.listdir(global_image_root_path_abs))
+    return {url: os.path.join(global_image_root_path_abs, filename)
+            for url, filename in url_to_filename.items() if filename in existing_filenames}
+
+
+def load_image_hash_index(global_image_root_path_abs):
+    """
+    扫描全局图片库，建立图片内容哈希到本地路径的映射。只收录以SHA-256哈希命名的图片文件。
+    Args:
+        global_image_root_path_abs (str): 全局图片库的绝对根目录。
+    Returns:
+        dict: 内容哈希 (十六进制字符串) 到图片绝对路径的映射。
+    """
+    hash_to_path = {}
+    with os.scandir(global_image_root_path_abs) as entries:
+        for entry in entries:
+            stem, ext = os.path.splitext(entry.name)
+            if ext != '.tmp' and len(stem) == 64 and entry.is_file():
+                hash_to_path.setdefault(stem, entry.path)
+    return hash_to_path
+
+
+def save_image_url_index(global_image_root_path_abs):
+    """
+    将 GLOBAL_IMAGE_URL_TO_PATH_MAP 写入全局图片库中的索引文件。先写入临时文件再替换，保证索引文件始终完整。
+    Args:
+        global_image_root_path_abs (str): 全局图片库的绝对根目录。
+    """
+    with IMAGE_DOWNLOAD_LOCK:
+        url_to_filename = {url: os.path.basename(path) for url, path in GLOBAL_IMAGE_URL_TO_PATH_MAP.items()}
+    index_path = os.path.join(global_image_root_path_abs, IMAGE_URL_INDEX_FILE)
+    tmp_index_path = index_path + ".tmp"
+    try:
+        dump_json_file(url_to_filename, tmp_index_path)
+        os.replace(tmp_index_path, index_path)
+    except OSError as e:
+        print(f"警告: 保存图片索引文件 '{index_path}' 失败: {e}")
+
+
+def detect_image_extension(header_bytes, original_url):
+    """
+    根据图片内容开头的特征字节判断扩展名，不依赖可能不准确的Content-Type (如 application/octet-stream)。
+    无法识别时尝试使用URL路径中的扩展名，仍无法确定则默认为 .jpg。
+    Args:
+        header_bytes (bytes): 图片内容的开头部分 (至少12字节即可识别所有支持的格式)。
+        original_url (str): 图片的网络URL。
+    Returns:
+        str: 以点开头的小写扩展名。
+    """
+    header_bytes = header_bytes.lstrip(b'\xef\xbb\xbf \t\r\n')  # SVG等文本格式开头可能有BOM或空白
+    for conditions, ext in IMAGE_MAGIC_SIGNATURES:
+        if all(header_bytes.startswith(magic, offset) for offset, magic in conditions):
+            return ext
+    _fname, url_ext_from_path = os.path.splitext(urllib.parse.urlparse(original_url).path)
+    if url_ext_from_path.lower() in IMAGE_URL_EXTENSIONS:
+        return url_ext_from_path.lower()
+    return '.jpg'
+
+
+def download_image(original_url, global_image_root_path_abs):
+    """
+    下载单张网络图片到全局图片库，并将其本地路径记录到 GLOBAL_IMAGE_URL_TO_PATH_MAP。
+    在图片下载线程池中执行。图片文件名为图片内容的SHA-256哈希，内容相同的图片只保存一份。
+    响应体按块流式写入临时文件并同时计算哈希，不会将整张图片读入内存。
+    Args:
+        original_url (str): 图片的网络URL。
+        global_image_root_path_abs (str): 全局图片库的绝对根目录。
+    Returns:
+        str or None: 图片的本地绝对路径，下载失败则返回None。
+    """
+    tmp_image_path_abs = None
+    try:
+        with IMAGE_SESSION.get(original_url, timeout=15, stream=True) as img_response:
+            img_response.raise_for_status()
+
+            # 边下载边写入临时文件并计算内容哈希，中断时不会留下不完整的图片
+            content_hasher = hashlib.sha256()
+            ext = None
+            with tempfile.NamedTemporaryFile('wb', dir=global_image_root_path_abs, suffix='.tmp', delete=False) as f_img:
+                tmp_image_path_abs = f_img.name
+                for chunk in img_response.iter_content(chunk_size=IMAGE_DOWNLOAD_CHUNK_SIZE):
+                    if ext is None:
+                        ext = detect_image_extension(chunk, original_url)  # 由第一块内容的文件头确定扩展名
+                    content_hasher.update(chunk)
+                    f_img.write(chunk)
+
+        ext = ext or detect_image_extension(b'', original_url)  # 响应体为空
+        # 文件名由图片内容哈希决定，不同URL指向的相同图片会共用同一个文件
+        content_hash = content_hasher.hexdigest()
+        with IMAGE_DOWNLOAD_LOCK:
+            local_image_path_abs = GLOBAL_IMAGE_HASH_TO_PATH_MAP.get(content_hash)
+            if local_image_path_abs and os.path.exists(local_image_path_abs):
+                os.remove(tmp_image_path_abs)
+                print(f"    图片内容已存在于全局库: {os.path.basename(local_image_path_abs)}")
+            else:
+                local_image_path_abs = os.path.join(global_image_root_path_abs, f"{content_hash}{ext}")
+                os.replace(tmp_image_path_abs, local_image_path_abs)
+                GLOBAL_IMAGE_HASH_TO_PATH_MAP[content_hash] = local_image_path_abs
+                print(f"    图片已下载到全局库: {os.path.basename(local_image_path_abs)}")
+            tmp_image_path_abs = None
+            GLOBAL_IMAGE_URL_TO_PATH_MAP[original_url] = local_image_path_abs  # 缓存此URL的本地路径
+        return local_image_path_abs
+    except requests.exceptions.RequestException as e:
+        print(f"    图片下载失败: {original_url[:80]} - {e}")
+    except Exception as e_img:
+        print(f"    处理图片时发生意外错误 {original_url[:80]}: {e_img}")
+    finally:
+        if tmp_image_path_abs and os.path.exists(tmp_image_path_abs):
+            os.remove(tmp_image_path_abs)  # 清理下载失败时残留的临时文件
+        with IMAGE_DOWNLOAD_LOCK:
+            IMAGE_DOWNLOAD_FUTURES.pop(original_url, None)  # 下载结束，失败的URL之后可再次尝试
+    return None
+
+
+def download_images_concurrently(image_urls, global_image_root_path_abs):
     """
-    处理Markdown内容中的图片：下载网络图片到全局图片库，并将链接替换为本地相对路径。
-    传入的内容应包含Frontmatter。图片文件名基于URL哈希和时间戳，不保证图片内容的唯一性。
+    通过图片下载线程池并发下载一组图片，已缓存的URL不会重复下载。
+    其他线程正在下载的同一URL会直接等待其结果，而不是再次下载。
     Args:
-        original_md_content_with_fm (str): 包含Frontmatter和Markdown主体的完整内容。
+        image_urls (Iterable[str]): 图片的网络URL。
+        global_image_root_path_abs (str): 全局图片库的绝对根目录。
+    Returns:
+        dict: URL到本地绝对路径的映射，下载失败的URL不包含在内。
+    """
+    url_to_local_path = {}
+    pending_futures = {}
+    with IMAGE_DOWNLOAD_LOCK:
+        for url in image_urls:
+            if url in GLOBAL_IMAGE_URL_TO_PATH_MAP:
+                url_to_local_path[url] = GLOBAL_IMAGE_URL_TO_PATH_MAP[url]
+                continue
+            future = IMAGE_DOWNLOAD_FUTURES.get(url)
+            if future is None:
+                future = IMAGE_DOWNLOAD_EXECUTOR.submit(download_image, url, global_image_root_path_abs)
+                IMAGE_DOWNLOAD_FUTURES[url] = future
+            pending_futures[url] = future
+
+    for url, future in pending_futures.items():
+        local_path = future.result()
+        if local_path:
+            url_to_local_path[url] = local_path
+    return url_to_local_path
+
+
+def process_markdown_images_globally(md_body, md_file_save_dir_abs, global_image_root_path_abs):
+    """
+    处理Markdown主体中的图片：下载网络图片到全局图片库，并将链接替换为本地相对路径。
+    传入的内容不应包含Frontmatter。先收集全部网络图片URL并发下载，再通过一次正则替换统一替换链接。
+    Args:
+        md_body (str): Markdown主体内容。
         md_file_save_dir_abs (str): Markdown文件计划保存的绝对目录 (用于计算图片相对路径)。
         global_image_root_path_abs (str): 全局图片库的绝对根目录。
     Returns:
-        str: 图片链接已本地化处理后的完整Markdown内容 (包含Frontmatter)。
+        str: 图片链接已本地化处理后的Markdown主体。
     """
     os.makedirs(global_image_root_path_abs, exist_ok=True)
 
-    # 分离Frontmatter和Markdown主体，只对主体部分处理图片
-    fm_str = ""
-    md_body = original_md_content_with_fm
-    if original_md_content_with_fm.startswith("---"):
-        parts = original_md_content_with_fm.split("---", 2)
-        if len(parts) > 2:
-            fm_str = parts[0] + "---" + parts[1] + "---\n"
-            md_body = parts[2]
-
-    processed_lines_body = []
-    img_pattern = r'!\[(?P<alt>.*?)\]\((?P<link>.+?)\)'
-    local_image_path_abs_for_current_image = None  # 用于存储当前处理图片的绝对路径
-
-    for line in md_body.splitlines():
-        new_line_parts = []
-        last_end = 0
-        for match in re.finditer(img_pattern, line):
-            alt_text = match.group('alt')
-            original_url = match.group('link')
-            new_line_parts.append(line[last_end:match.start()])
-            local_image_path_abs_for_current_image = None
-
-            if original_url.startswith('http://') or original_url.startswith('https://'):
-                # 检查此URL是否已在本次运行的缓存中
-                if original_url in GLOBAL_IMAGE_URL_TO_PATH_MAP:
-                    local_image_path_abs_for_current_image = GLOBAL_IMAGE_URL_TO_PATH_MAP[original_url]
-                else:  # 如果未在缓存中，则下载
-                    try:
-                        img_response = requests.get(original_url, timeout=15)
-                        img_response.raise_for_status()
-                        img_content_bytes = img_response.content
-
-                        content_type_header = img_response.headers.get('content-type', '')
-                        mime_type = content_type_header.split(';')[0].strip().lower()
-                        ext = '.jpg'
-                        if mime_type == 'image/svg+xml':
-                            ext = '.svg'
-                        elif mime_type == 'image/jpeg' or mime_type == 'image/jpg':
-                            ext = ".jpg"
-                        elif mime_type == 'image/png':
-                            ext = ".png"
-                        elif mime_type == 'image/gif':
-                            ext = ".gif"
-                        elif mime_type == 'image/webp':
-                            ext = ".webp"
-                        else:  # 尝试从URL路径中提取扩展名
-                            parsed_url_path = urllib.parse.urlparse(original_url).path
-                            _fname, url_ext_from_path = os.path.splitext(parsed_url_path)
-                            if url_ext_from_path and len(url_ext_from_path) <= 5 and url_ext_from_path.startswith('.'):
-                                if url_ext_from_path.lower() in ['.jpg', '.jpeg', '.png', '.gif', '.webp', '.svg']:
-                                    ext = url_ext_from_path.lower()
-
-                        # 文件名包含URL哈希和微秒时间戳，以确保文件名在全局图片库中的唯一性
-                        url_hash_part = hashlib.md5(original_url.encode('utf-8')).hexdigest()[:16]
-                        timestamp_part = str(int(time.time() * 1000000))
-                        local_image_name = f"{url_hash_part}_{timestamp_part}{ext}"
-                        local_image_path_abs_for_current_image = os.path.join(global_image_root_path_abs, local_image_name)
-
-                        with open(local_image_path_abs_for_current_image, 'wb') as f_img:
-                            f_img.write(img_content_bytes)
-                        GLOBAL_IMAGE_URL_TO_PATH_MAP[original_url] = local_image_path_abs_for_current_image  # 缓存此URL的本地路径
-                        print(f"    图片已下载到全局库: {os.path.basename(local_image_path_abs_for_current_image)}")
-
-                    except requests.exceptions.RequestException as e:
-                        print(f"    图片下载失败: {original_url[:80]} - {e}")
-                        new_line_parts.append(f"![{alt_text}]({original_url})")
-                        last_end = match.end()
-                        continue
-                    except Exception as e_img:
-                        print(f"    处理图片时发生意外错误 {original_url[:80]}: {e_img}")
-                        new_line_parts.append(f"![{alt_text}]({original_url})")
-                        last_end = match.end()
-                        continue
-
-                if local_image_path_abs_for_current_image:  # 替换为本地相对路径
-                    try:
-                        rel_path = os.path.relpath(local_image_path_abs_for_current_image, md_file_save_dir_abs)
-                    except ValueError:
-                        rel_path = urllib.parse.urljoin('file:', urllib.request.pathname2url(local_image_path_abs_for_current_image))
-                    new_line_parts.append(f"![{alt_text}]({rel_path.replace(os.sep, '/')})")  # 使用POSIX风格路径分隔符
-                else:
-                    new_line_parts.append(f"![{alt_text}]({original_url})")  # 如果处理失败，保留原始链接
-            else:
-                new_line_parts.append(f"![{alt_text}]({original_url})")  # 非网络图片链接，直接保留
-            last_end = match.end()
-        new_line_parts.append(line[last_end:])
-        processed_lines_body.append("".join(new_line_parts))
+    # 收集主体中的全部网络图片URL并发下载
+    image_urls = {match.group('link') for match in MARKDOWN_IMAGE_PATTERN.finditer(md_body)
+                  if match.group('link').startswith(('http://', 'https://'))}
+    url_to_local_path = download_images_concurrently(image_urls, global_image_root_path_abs)
 
-    return fm_str + "\n".join(processed_lines_body)  # 重新拼接Frontmatter和处理后的主体
+    # 所有图片都直接保存在全局图片库根目录下，只需为本文件计算一次图片库的相对路径
+    try:
+        image_dir_rel_path = os.path.relpath(global_image_root_path_abs, md_file_save_dir_abs).replace(os.sep, '/')  # 使用POSIX风格路径分隔符
+    except ValueError:
+        image_dir_rel_path = None  # 位于不同驱动器，无法使用相对路径
+
+    def localize_image_link(match):
+        local_image_path_abs = url_to_local_path.get(match.group('link'))
+        if not local_image_path_abs:
+            return match.group(0)  # 非网络图片或下载失败，保留原始链接
+        local_image_name = os.path.basename(local_image_path_abs)
+        if image_dir_rel_path is None:
+            rel_path = urllib.parse.urljoin('file:', urllib.request.pathname2url(local_image_path_abs))
+        elif image_dir_rel_path == '.':
+            rel_path = local_image_name
+        else:
+            rel_path = f"{image_dir_rel_path}/{local_image_name}"
+        return f"![{match.group('alt')}]({rel_path})"
+
+    return MARKDOWN_IMAGE_PATTERN.sub(localize_image_link, md_body)
+
+
+def build_markdown_dir_index(md_save_dir_abs):
+    """
+    扫描Markdown保存目录，一次性解析其中所有Markdown文件的Frontmatter，供 get_available_filename 查询。
+    Args:
+        md_save_dir_abs (str): Markdown文件保存的绝对目录。
+    Returns:
+        tuple: (used_filenames, url_index)。
+            used_filenames (set): 目录中已存在的文件名 (经 os.path.normcase 规范化)。
+            url_index (dict): 文章URL -> {修改时间字符串 (按 FRONTMATTER_TIME_FORMAT 格式化，无效时为None): 文件名}。
+    """
+    used_filenames = set()
+    url_index = {}
+    try:
+        with os.scandir(md_save_dir_abs) as entries:
+            for entry in entries:
+                key = os.path.normcase(entry.name)
+                used_filenames.add(key)
+                if not (key.endswith('.md') and entry.is_file()):
+                    continue
+                fm_data = parse_frontmatter_from_file(entry.path)
+                if fm_data and fm_data.get('url') not in PLACEHOLDER_URLS:
+                    modified_dt = fm_data.get('modified_dt')
+                    modified = modified_dt.strftime(FRONTMATTER_TIME_FORMAT) if modified_dt else None
+                    url_index.setdefault(fm_data['url'], {}).setdefault(modified, entry.name)
+    except FileNotFoundError:
+        pass
+    return used_filenames, url_index
 
 
-def get_available_filename(base_name_stem, new_item_metadata, md_save_dir_abs):
+def get_available_filename(base_name_stem, new_item_metadata, md_save_dir_abs, used_filenames, url_index):
     """
-    获取可用的Markdown文件名。如果文件名已存在，则比较Frontmatter中的URL和修改时间。
-    若URL和修改时间（精确到分钟）均相同，则返回None (表示应跳过)。
-    否则，尝试添加计数器 (如 文件名(1).md) 直到找到不冲突的名称。
+    获取可用的Markdown文件名。先按URL在 url_index 中查找已保存的版本，
+    若已有URL和修改时间（精确到分钟）均相同的文件，则返回None (表示应跳过)。
+    URL为占位值 (见 PLACEHOLDER_URLS) 的项目无法判断重复，不查询也不登记 url_index，总是分配新文件名。
+    否则，尝试添加计数器 (如 文件名(1).md) 直到找到不在 used_filenames 中的名称。
+    选中的文件名会立即登记到 used_filenames 和 url_index，因此同一批次中的其他项目不会再分配到相同的文件名。
     Args:
         base_name_stem (str): 已经过清理的文件名基础部分 (通常是文章标题)。
-        new_item_metadata (dict): 新下载项目的元数据 (包含datetime类型的'modified'键)。
+        new_item_metadata (dict): 新下载项目的元数据 (包含Unix时间戳类型的'modified_ts'键)。
         md_save_dir_abs (str): Markdown文件计划保存的绝对目录。
+        used_filenames (set): 由 build_markdown_dir_index 建立的已占用文件名集合。
+        url_index (dict): 由 build_markdown_dir_index 建立的URL索引。
     Returns:
         str or None: 可用的完整文件路径，或在内容判断为重复时返回None。
     """
-    counter = 0
     new_url = new_item_metadata.get('url')
-    new_modified_dt = new_item_metadata.get('modified')
+    new_modified_ts = new_item_metadata.get('modified_ts')
+    new_modified = format_timestamp(new_modified_ts) if new_modified_ts else None
+
+    # 占位URL的项目使用一个临时字典，不影响 url_index
+    saved_versions = {} if new_url in PLACEHOLDER_URLS else url_index.setdefault(new_url, {})
+    if new_modified in saved_versions:
+        if new_modified:
+            print(f"    已存在URL和最后修改时间均相同的文件: {saved_versions[new_modified]}, 跳过。")
+        else:
+            print(f"    已存在URL相同且均无有效修改时间的文件: {saved_versions[new_modified]}, 跳过。")
+        return None
+
+    counter = 0
     while True:
         current_filename_md = f"{base_name_stem}.md" if counter == 0 else f"{base_name_stem}({counter}).md"
-        full_path_md = os.path.join(md_save_dir_abs, current_filename_md)
-        if not os.path.exists(full_path_md):
-            return full_path_md  # 文件名可用
-
-        existing_fm_data = parse_frontmatter_from_file(full_path_md)  # 解析已存在文件的Frontmatter
-        if existing_fm_data:
-            existing_url = existing_fm_data.get('url')
-            existing_modified_dt = existing_fm_data.get('modified_dt')
-            if new_url == existing_url:  # URL相同，比较修改时间
-                if new_modified_dt and existing_modified_dt:  # 确保两者都有有效的修改时间
-                    if new_modified_dt.strftime('%Y-%m-%d %H:%M') == existing_modified_dt.strftime('%Y-%m-%d %H:%M'):
-                        print(f"    已存在URL和最后修改时间均相同的文件: {os.path.basename(full_path_md)}, 跳过。")
-                        return None
-                elif new_modified_dt is None and existing_modified_dt is None:  # 两者都无修改时间，且URL相同
-                    print(f"    已存在URL相同且均无有效修改时间的文件: {os.path.basename(full_path_md)}), 跳过。")
-                    return None
-        counter += 1  # 文件名冲突或内容不重复，尝试下一个文件名
+        index_key = os.path.normcase(current_filename_md)
+        if index_key not in used_filenames:
+            used_filenames.add(index_key)  # 登记为已占用
+            saved_versions[new_modified] = current_filename_md
+            return os.path.join(md_save_dir_abs, current_filename_md)  # 文件名可用
+        counter += 1  # 文件名冲突，尝试下一个文件名
 
 
 # --- 主要处理循环 ---
-def download_collection_items(start_offset, total_items, collection_url, params_template, cookies, headers, collection_md_save_path_abs, global_image_root_path_abs):
+def save_collection_item(md_filepath, item_metadata, html_content_str, collection_md_save_path_abs, global_image_root_path_abs):
+    """
+    将单个项目的HTML内容转换为Markdown，生成Frontmatter、下载图片并写入Markdown文件。可在工作线程中并发调用。
+    Args:
+        md_filepath (str): 已分配给该项目的Markdown文件完整路径。
+        item_metadata (dict): 项目元数据。
+        html_content_str (str): 项目的HTML内容。
+        collection_md_save_path_abs (str): 收藏夹Markdown文件的保存目录。
+        global_image_root_path_abs (str): 全局图片库的绝对根目录。
+    """
+    # 1. 将HTML转换为Markdown主体
+    try:
+        original_md_body = html_to_markdown(html_content_str)
+    except Exception as e:
+        print(f"    html2text转换错误: {e}")
+        original_md_body = "错误: HTML转Markdown失败。"
+    # 2. 生成Frontmatter
+    frontmatter_str = generate_frontmatter(item_metadata)
+    # 3. 处理主体中的图片（下载并替换链接）
+    md_body_with_local_images = process_markdown_images_globally(
+        original_md_body, collection_md_save_path_abs, global_image_root_path_abs)
+
+    # 4. 保存文件：Frontmatter与主体之间空一行，分别写入同一个文件缓冲区，无需先拼接
+    try:
+        os.makedirs(os.path.dirname(md_filepath), exist_ok=True)
+        with open(md_filepath, "w", encoding="utf-8") as file:
+            file.write(frontmatter_str)
+            file.write("\n")
+            file.write(md_body_with_local_images)
+        print(f"  已保存: {os.path.basename(md_filepath)}")
+    except Exception as e:
+        print(f"  错误: 保存文件 {os.path.basename(md_filepath)} 失败: {e}")
+
+
+def download_collection_items(start_offset, total_items, collection_url, params_template, collection_md_save_path_abs, global_image_root_path_abs, max_workers=DEFAULT_DOWNLOAD_THREADS):
     """
     下载指定收藏夹中的所有项目，并将它们保存为Markdown文件。
     在下载前会先判断是否需要跳过该项目（基于Frontmatter的URL和修改时间）。
+    每页中需要保存的项目由线程池并发处理（内容转换、图片下载与文件写入），线程数由 max_workers 指定。
     """
     current_offset_for_retry = start_offset  # 用于网络错误时记录从哪里开始重试
+    retry_delay = NETWORK_RETRY_INITIAL_DELAY
+    retry_attempts = 0
     collection_api_id = collection_url.split('/')[-1]
     collection_api_url_base = f"https://www.zhihu.com/api/v4/collections/{collection_api_id}/items"
-    try:
-        for offset_val in range(start_offset, total_items, params_template['limit']):
-            current_offset_for_retry = offset_val
-            page_num = int(offset_val / params_template['limit']) + 1
-            current_params = params_template.copy()
-            current_params['offset'] = offset_val
-
-            print(f'\n正在获取第 {page_num} 页 (偏移量: {offset_val})，来自 {collection_url}')
-            time.sleep(0.8)  # 礼貌性停顿
-
-            items_on_page = get_page_json(collection_api_url_base, cookies, headers, current_params)
-            if not items_on_page:
-                print(f"    第 {page_num} 页未找到项目，或已到达收藏夹末尾。")
+    # 一次性建立保存目录中已有文件的索引，判断重名和重复时无需反复读取磁盘
+    used_md_filenames, md_url_index = build_markdown_dir_index(collection_md_save_path_abs)
+    # 每个收藏夹只复制一次参数模板，翻页时仅原地修改偏移量 (页面按顺序获取，不会被多个线程共享)
+    page_params = params_template.copy()
+    while True:
+        try:
+            for offset_val in range(start_offset, total_items, params_template['limit']):
+                current_offset_for_retry = offset_val
+                page_num = int(offset_val / params_template['limit']) + 1
+                page_params['offset'] = offset_val
+
+                print(f'\n正在获取第 {page_num} 页 (偏移量: {offset_val})，来自 {collection_url}')
+                time.sleep(0.8)  # 礼貌性停顿
+
+                items_on_page = get_page_json(collection_api_url_base, page_params)
+                if not items_on_page:
+                    print(f"    第 {page_num} 页未找到项目，或已到达收藏夹末尾。")
+                    break
+
+                # 先在主线程中依次确定每个项目的文件名，避免并发时同名项目争用同一路径
+                items_to_save = []
+                for idx, item_json_data in enumerate(items_on_page):
+                    item_number_overall = offset_val + idx + 1
+                    print(f"\n正在处理第 {item_number_overall}/{total_items} 个项目...")
+
+                    # 1. 获取元数据和HTML内容
+                    item_metadata, html_content_str = get_item_metadata_and_content(item_json_data)
+                    print(f"  标题: {item_metadata['title']}")
+
+                    # 2. 根据元数据生成文件名，并提前判断是否跳过
+                    filename_stem_for_md = sanitize_filename(item_metadata['title'])
+                    if not filename_stem_for_md:
+                        filename_stem_for_md = f"未命名知乎项目_{item_number_overall}"
+
+                    available_md_filepath_if_not_skipped = get_available_filename(
+                        filename_stem_for_md, item_metadata, collection_md_save_path_abs, used_md_filenames, md_url_index)
+
+                    if available_md_filepath_if_not_skipped is None:
+                        continue  # 如果应跳过，则处理下一个
+                    items_to_save.append((available_md_filepath_if_not_skipped, item_metadata, html_content_str))
+
+                # 3. 并发转换内容、下载图片并保存文件
+                if items_to_save:
+                    with ThreadPoolExecutor(max_workers=min(max_workers, len(items_to_save))) as executor:
+                        list(executor.map(
+                            lambda item: save_collection_item(*item, collection_md_save_path_abs, global_image_root_path_abs),
+                            items_to_save))
+                    save_image_url_index(global_image_root_path_abs)
+                retry_delay = NETWORK_RETRY_INITIAL_DELAY  # 本页成功，重置退避时间和重试次数
+                retry_attempts = 0
+            break  # 所有页面处理完毕
+
+        except requests.exceptions.RequestException as e_req:  # 网络错误处理：指数退避后从出错的页面继续
+            retry_attempts += 1
+            if not is_retryable_request_error(e_req):
+                print(f"请求错误: {e_req}\n该错误无法通过重试解决 (请检查Cookies和x-zse-96是否有效)，停止下载此收藏夹。")
                 break
-
-            for idx, item_json_data in enumerate(items_on_page):
-                item_number_overall = offset_val + idx + 1
-                print(f"\n正在处理第 {item_number_overall}/{total_items} 个项目...")
-
-                # 1. 获取元数据和原始Markdown主体
-                item_metadata, original_md_body = get_item_metadata_and_content(item_json_data)
-                print(f"  标题: {item_metadata['title']}")
-
-                # 2. 根据元数据生成文件名，并提前判断是否跳过
-                filename_stem_for_md = sanitize_filename(item_metadata['title'])
-                if not filename_stem_for_md:
-                    filename_stem_for_md = f"未命名知乎项目_{item_number_overall}"
-
-                available_md_filepath_if_not_skipped = get_available_filename(
-                    filename_stem_for_md, item_metadata, collection_md_save_path_abs)
-
-                if available_md_filepath_if_not_skipped is None:
-                    continue  # 如果应跳过，则处理下一个
-
-                # 3. 生成Frontmatter
-                frontmatter_str = generate_frontmatter(item_metadata)
-                # 4. 拼接Frontmatter和原始Markdown主体
-                full_content_before_image_processing = frontmatter_str + original_md_body
-                # 5. 处理图片（下载并替换链接）
-                content_with_local_images = process_markdown_images_globally(
-                    full_content_before_image_processing, collection_md_save_path_abs, global_image_root_path_abs)
-
-                # 6. 保存文件
-                try:
-                    os.makedirs(os.path.dirname(available_md_filepath_if_not_skipped), exist_ok=True)
-                    with open(available_md_filepath_if_not_skipped, "w", encoding="utf-8") as file:
-                        file.write(content_with_local_images)
-                    print(f"  已保存: {os.path.basename(available_md_filepath_if_not_skipped)}")
-                except Exception as e:
-                    print(f"  错误: 保存文件 {os.path.basename(available_md_filepath_if_not_skipped)} 失败: {e}")
-
-    except requests.exceptions.RequestException as e_req:  # 网络错误处理
-        print(f"网络错误: {e_req}\n将在5秒后尝试从偏移量 {current_offset_for_retry} 继续...")
-        time.sleep(5)
-        download_collection_items(current_offset_for_retry, total_items, collection_url, params_template, cookies, headers, collection_md_save_path_abs, global_image_root_path_abs)
-    except Exception as e_gen:  # 其他意外错误
-        print(f"意外错误: {e_gen}")
-        import traceback
-        traceback.print_exc()
+            if retry_attempts > NETWORK_RETRY_MAX_ATTEMPTS:
+                print(f"网络错误: {e_req}\n已连续重试 {NETWORK_RETRY_MAX_ATTEMPTS} 次，停止下载此收藏夹。")
+                break
+            wait_seconds = get_retry_after_seconds(e_req.response) or retry_delay
+            print(f"网络错误: {e_req}\n将在{wait_seconds}秒后尝试从偏移量 {current_offset_for_retry} 继续...")
+            time.sleep(wait_seconds)
+            retry_delay = min(retry_delay * 2, NETWORK_RETRY_MAX_DELAY)
+            start_offset = current_offset_for_retry
+        except Exception as e_gen:  # 其他意外错误
+            print(f"意外错误: {e_gen}")
+            import traceback
+            traceback.print_exc()
+            break
 
 
 # --- 主程序执行 ---
 def main():
-    # 初始化/重置单次运行的图片URL缓存
-    global GLOBAL_IMAGE_URL_TO_PATH_MAP
-    GLOBAL_IMAGE_URL_TO_PATH_MAP = {}
+    # 图片URL缓存与图片下载线程池在读取配置后初始化
+    global GLOBAL_IMAGE_URL_TO_PATH_MAP, GLOBAL_IMAGE_HASH_TO_PATH_MAP, IMAGE_DOWNLOAD_EXECUTOR
 
     # 加载Cookies
     try:
-        with open(CONFIG_FILE_COOKIES, "r", encoding="utf-8") as f:
-            cookies = json.load(f)
+        cookies = load_json_file(CONFIG_FILE_COOKIES)
     except FileNotFoundError:
         print(f"错误: Cookies配置文件 '{CONFIG_FILE_COOKIES}' 未找到。请确保它与脚本在同一目录下。")
         return
@@ -500,11 +875,12 @@ def main():
         'x-zse-93': '101_3_3.0',
         'x-zse-96': '2.0_AQCxxxxxxxxxxxxxxxxxxxxxxxxxxxx',  # <--- !!! 在此替换为你的有效x-zse-96值 !!!
     }
+    ZHIHU_SESSION.headers.update(headers)
+    ZHIHU_SESSION.cookies.update(cookies)
 
     # 加载URL配置文件
     try:
-        with open(CONFIG_FILE_URL, "r", encoding="utf-8") as f:
-            config = json.load(f)
+        config = load_json_file(CONFIG_FILE_URL)
     except FileNotFoundError:
         print(f"错误: URL配置文件 '{CONFIG_FILE_URL}' 未找到。")
         return
@@ -520,12 +896,27 @@ def main():
     global_image_root_path_abs = os.path.abspath(global_image_path_from_config)
     print(f"全局图片库位置设置为: {global_image_root_path_abs}")
     os.makedirs(global_image_root_path_abs, exist_ok=True)
+    # 加载已下载图片的索引，已在库中的图片无需再次下载
+    GLOBAL_IMAGE_URL_TO_PATH_MAP = load_image_url_index(global_image_root_path_abs)
+    GLOBAL_IMAGE_HASH_TO_PATH_MAP = load_image_hash_index(global_image_root_path_abs)
+    print(f"已从图片索引加载 {len(GLOBAL_IMAGE_URL_TO_PATH_MAP)} 条记录。")
 
     collections_to_process = config.get('collections', [])
     if not collections_to_process:
         print(f"URL配置文件 '{CONFIG_FILE_URL}' 中的 'collections' 列表为空或未找到。")
         return
 
+    # 并发下载项目的线程数
+    download_threads = config.get('threads', DEFAULT_DOWNLOAD_THREADS)
+    if not isinstance(download_threads, int) or download_threads < 1:
+        print(f"警告: URL配置文件 '{CONFIG_FILE_URL}' 中的 'threads' 无效，使用默认值 {DEFAULT_DOWNLOAD_THREADS}。")
+        download_threads = DEFAULT_DOWNLOAD_THREADS
+    # 图片由多个线程并发下载，连接池需能容纳所有并发连接，否则多余的连接用完即被丢弃
+    if download_threads > HTTP_POOL_MAXSIZE:
+        mount_http_adapter(IMAGE_SESSION, download_threads)
+    IMAGE_DOWNLOAD_EXECUTOR.shutdown()
+    IMAGE_DOWNLOAD_EXECUTOR = ThreadPoolExecutor(max_workers=download_threads)
+
     api_params_template = {'limit': 20, 'offset': 0}  # API分页参数模板
 
     for collection_entry in collections_to_process:
@@ -551,12 +942,13 @@ def main():
         print(f"\n\n\n--- 开始处理收藏夹: {collection_url_str} ---")
         print(f"Markdown文件将保存至: {collection_md_save_path_abs}")
         try:
-            total_items_in_collection = get_answer_count(collection_url_str, cookies, headers, api_params_template)
+            total_items_in_collection = get_answer_count(collection_url_str, api_params_template)
             print(f"收藏夹中的项目总数: {total_items_in_collection}")
             if total_items_in_collection > 0:
                 download_collection_items(0, total_items_in_collection, collection_url_str,
-                                          api_params_template, cookies, headers,
-                                          collection_md_save_path_abs, global_image_root_path_abs)
+                                          api_params_template,
+                                          collection_md_save_path_abs, global_image_root_path_abs,
+                                          download_threads)
             else:
                 print("此收藏夹为空或无法确定项目数量。")
         except Exception as e_outer: